@@ -5,8 +5,10 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
 from typing import Union
@@ -22,11 +24,11 @@ database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
 if database_url and database_name:
-    _client = MongoClient(database_url)
+    _client = AsyncIOMotorClient(database_url, maxPoolSize=100, minPoolSize=10)
     db = _client[database_name]
 
 # Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
+async def create_document(collection_name: str, data: Union[BaseModel, dict]):
     """Insert a single document with timestamp"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
@@ -40,16 +42,69 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
     data_dict['created_at'] = datetime.now(timezone.utc)
     data_dict['updated_at'] = datetime.now(timezone.utc)
 
-    result = db[collection_name].insert_one(data_dict)
+    result = await db[collection_name].insert_one(data_dict)
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None, projection: dict = None):
     """Get documents from collection"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
-    
-    cursor = db[collection_name].find(filter_dict or {})
+
+    cursor = db[collection_name].find(filter_dict or {}, projection)
     if limit:
         cursor = cursor.limit(limit)
-    
-    return list(cursor)
+
+    return await cursor.to_list(length=limit)
+
+# Batched fire-and-forget inserts. High-rate write endpoints (leads,
+# appointments) enqueue here and a background task coalesces up to
+# _BATCH_MAX_DOCS documents or _BATCH_MAX_WAIT seconds into a single
+# insert_many per collection — one Mongo roundtrip per batch instead of
+# one per request. Best-effort durability: a crash can lose whatever is
+# still queued inside the batching window.
+_logger = logging.getLogger(__name__)
+_insert_queue: asyncio.Queue = asyncio.Queue()
+_BATCH_MAX_DOCS = 100
+_BATCH_MAX_WAIT = 0.05
+
+def enqueue_document(collection_name: str, data: Union[BaseModel, dict]):
+    """Queue a single document for batched insertion"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    if isinstance(data, BaseModel):
+        data_dict = data.model_dump()
+    else:
+        data_dict = data.copy()
+
+    data_dict['created_at'] = datetime.now(timezone.utc)
+    data_dict['updated_at'] = datetime.now(timezone.utc)
+
+    _insert_queue.put_nowait((collection_name, data_dict))
+
+async def _drain_inserts():
+    loop = asyncio.get_running_loop()
+    while True:
+        collection_name, doc = await _insert_queue.get()
+        batches = {collection_name: [doc]}
+        count = 1
+        deadline = loop.time() + _BATCH_MAX_WAIT
+        while count < _BATCH_MAX_DOCS:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                collection_name, doc = await asyncio.wait_for(_insert_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batches.setdefault(collection_name, []).append(doc)
+            count += 1
+        for name, docs in batches.items():
+            try:
+                await db[name].insert_many(docs, ordered=False)
+            except Exception:
+                _logger.exception("batched insert into %s failed (%d docs)", name, len(docs))
+
+def start_insert_writer():
+    """Start the background insert coalescer on the running event loop"""
+    return asyncio.create_task(_drain_inserts())
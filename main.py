@@ -1,26 +1,47 @@
+import asyncio
+import hashlib
 import os
-from datetime import datetime, timedelta
-from typing import Optional, List
-
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import boto3
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import orjson
+from cachetools import TTLCache
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel, EmailStr
-from passlib.context import CryptContext
+import bcrypt
 import jwt
+from pymongo.errors import BulkWriteError
 
-from database import db, create_document, get_documents
-from schemas import User, Lead, Appointment, Package, BlogPost, Testimonial, ContactMessage, OTPRequest, Upload
+from database import db, create_document, enqueue_document, get_documents, start_insert_writer
+from schemas import User, Lead, Appointment, Package, BlogPost, Testimonial, ContactMessage, Upload
 
 APP_NAME = "SAKSHAM PRAVESH"
 JWT_SECRET = os.getenv("JWT_SECRET", "devsecret")
 JWT_ALGO = "HS256"
 TOKEN_EXPIRE_MINUTES = 60 * 24
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-app = FastAPI(title=APP_NAME, version="1.0.0")
+# One PyJWT instance with a pre-encoded key and a reused algorithms
+# list, so per-call decode skips key re-derivation and list parsing.
+_jwt = jwt.PyJWT()
+_jwt_key = JWT_SECRET.encode()
+_jwt_algos = [JWT_ALGO]
+
+S3_BUCKET = os.getenv("S3_BUCKET")
+_s3 = boto3.client("s3") if S3_BUCKET else None
+
+app = FastAPI(title=APP_NAME, version="1.0.0", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,36 +51,103 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def ensure_indexes():
+    # Hot lookups (login, auth dependency, OTP verify) are COLLSCANs
+    # without these; the TTL index also auto-purges expired OTP docs.
+    if db is None:
+        return
+    await db.user.create_index("email", unique=True)
+    await db.otprequest.create_index([("target", 1), ("code", 1), ("purpose", 1)])
+    await db.otprequest.create_index("expires_at", expireAfterSeconds=0)
+    await db.package.create_index("slug", unique=True)
+    await db.blogpost.create_index("slug", unique=True)
+
+@app.on_event("startup")
+async def warmup():
+    # Pre-open pooled sockets so the first real request doesn't pay the
+    # TLS handshake, auth and topology discovery cost.
+    if db is None:
+        return
+    await db.command("ping")
+    for collection in ("user", "package", "blogpost", "otprequest"):
+        await db[collection].find_one({}, {"_id": 1})
+
+@app.on_event("startup")
+async def start_background_writer():
+    if db is not None:
+        start_insert_writer()
+
 # Helpers
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+# Bcrypt pins a core for ~250ms per call, so hashing runs in worker
+# processes instead of the event loop's threadpool — concurrent logins
+# then scale across cores instead of serializing under the GIL. The
+# helpers are plain module-level functions so only the arguments get
+# pickled. The native bcrypt library is called directly; existing
+# passlib-era $2b$ hashes verify unchanged.
+_bcrypt_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+
+def _hash(password: str) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
+
+def _verify(password: str, hashed: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode(), hashed.encode())
+    except ValueError:
+        return False
 
-def verify_password(password: str, hashed: str) -> bool:
-    return pwd_context.verify(password, hashed)
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_bcrypt_pool, _hash, password)
+
+async def verify_password(password: str, hashed: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(_bcrypt_pool, _verify, password, hashed)
 
 def create_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGO)
+    # Integer epoch avoids a datetime allocation + UTC resolution per
+    # mint; PyJWT accepts it natively for exp.
+    ttl = expires_delta.total_seconds() if expires_delta else TOKEN_EXPIRE_MINUTES * 60
+    to_encode = {**data, "exp": int(time.time() + ttl)}
+    return _jwt.encode(to_encode, _jwt_key, algorithm=JWT_ALGO)
 
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
+# Verified tokens are cached for a short window so hot endpoints skip the
+# HMAC check and the Mongo roundtrip. TTL stays well below token expiry so
+# revoked/deleted users drop out quickly.
+AUTH_CACHE_TTL = 30
+_token_cache = TTLCache(maxsize=10000, ttl=AUTH_CACHE_TTL)
+
+# Shape check applied before any crypto: probes and scanners sending
+# garbage bearer tokens get rejected without touching PyJWT.
+_JWT_RE = re.compile(r"^[A-Za-z0-9_\-]+\.[A-Za-z0-9_\-]+\.[A-Za-z0-9_\-]+$")
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+    if len(token) > 4096 or not _JWT_RE.match(token):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    token_key = hashlib.sha256(token.encode()).digest()
+    cached = _token_cache.get(token_key)
+    if cached is not None:
+        return cached
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
+        payload = _jwt.decode(token, _jwt_key, algorithms=_jwt_algos, options={"verify_aud": False})
         email = payload.get("sub")
         if not email:
             raise HTTPException(status_code=401, detail="Invalid token")
-        user = db.user.find_one({"email": email}) if db else None
+        user = await db.user.find_one({"email": email}) if db is not None else None
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
-        return {"email": user["email"], "name": user.get("name"), "role": user.get("role", "user")}
+        result = {"email": user["email"], "name": user.get("name"), "role": user.get("role", "user")}
+        # Don't cache past the token's own expiry
+        if payload.get("exp", 0) - time.time() > AUTH_CACHE_TTL:
+            _token_cache[token_key] = result
+        return result
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
+    except HTTPException:
+        raise
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
 
@@ -80,111 +168,195 @@ class OTPVerify(BaseModel):
     purpose: str
 
 @app.post("/auth/register", response_model=Token)
-def register(name: str = Form(...), email: EmailStr = Form(...), password: str = Form(...)):
-    if not db:
+async def register(name: str = Form(...), email: EmailStr = Form(...), password: str = Form(...)):
+    if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    if db.user.find_one({"email": email}):
+    if await db.user.find_one({"email": email}):
         raise HTTPException(status_code=400, detail="Email already registered")
-    user = User(name=name, email=email, password_hash=hash_password(password))
-    create_document("user", user)
+    # Form params are already validated; model_construct skips a second
+    # validation pass.
+    user = User.model_construct(name=name, email=email, password_hash=await hash_password(password))
+    await create_document("user", user)
     token = create_token({"sub": email})
     return Token(access_token=token)
 
 @app.post("/auth/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    if not db:
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    user = db.user.find_one({"email": form_data.username})
-    if not user or not verify_password(form_data.password, user.get("password_hash", "")):
+    user = await db.user.find_one({"email": form_data.username})
+    if not user or not await verify_password(form_data.password, user.get("password_hash", "")):
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     token = create_token({"sub": user["email"]})
     return Token(access_token=token)
 
+# Pending OTPs live in a process-local TTL cache rather than Mongo —
+# two network roundtrips saved per flow. For multi-worker deployments
+# move this to Redis (SETEX) so codes are visible across processes.
+_otp_cache = TTLCache(maxsize=100000, ttl=600)
+
 @app.post("/auth/otp/start")
-def otp_start(body: OTPStart):
-    if not db:
-        raise HTTPException(status_code=500, detail="Database not configured")
+async def otp_start(body: OTPStart):
     # Dev OTP code 123456; In production integrate with SMS/Email provider
-    record = OTPRequest(channel=body.channel, target=body.target, code="123456", purpose=body.purpose, expires_at=datetime.utcnow() + timedelta(minutes=10))
-    create_document("otprequest", record)
+    _otp_cache[(body.target, body.purpose)] = "123456"
     return {"sent": True, "dev_code": "123456"}
 
 @app.post("/auth/otp/verify")
-def otp_verify(body: OTPVerify):
-    if not db:
-        raise HTTPException(status_code=500, detail="Database not configured")
-    req = db.otprequest.find_one({"target": body.target, "code": body.code, "purpose": body.purpose})
-    if not req:
+async def otp_verify(body: OTPVerify):
+    if _otp_cache.get((body.target, body.purpose)) != body.code:
         raise HTTPException(status_code=400, detail="Invalid code")
     return {"verified": True}
 
 # Packages & public content
 
-@app.get("/packages", response_model=List[Package])
-def list_packages():
-    if not db:
+# /packages is public and read-mostly: the doc list is cached for 60s
+# server-side, and ETag + Cache-Control let browsers/CDNs skip the
+# server entirely between changes.
+_packages_cache = TTLCache(maxsize=8, ttl=60)
+PACKAGES_CACHE_CONTROL = "public, max-age=60, s-maxage=300"
+
+async def _fetch_packages():
+    cached = _packages_cache.get("packages")
+    if cached is None:
+        docs = await get_documents("package", projection={"_id": 0})
+        etag = hashlib.blake2b(orjson.dumps(docs)).hexdigest()[:16]
+        cached = (docs, etag)
+        _packages_cache["packages"] = cached
+    return cached
+
+@app.get("/packages")
+async def list_packages(request: Request):
+    if db is None:
         return []
-    docs = get_documents("package")
-    return [Package(**{k: v for k, v in d.items() if k != "_id"}) for d in docs]
+    # Docs were written by this app; skip Pydantic re-validation and let
+    # orjson serialize them directly.
+    docs, etag = await _fetch_packages()
+    headers = {"Cache-Control": PACKAGES_CACHE_CONTROL, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return ORJSONResponse(docs, headers=headers)
 
 @app.post("/packages")
-def create_package(pkg: Package, user=Depends(get_current_user)):
+async def create_package(pkg: Package, user=Depends(get_current_user)):
     if user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Forbidden")
-    create_document("package", pkg)
+    await create_document("package", pkg)
+    # Only evicts this worker's cache; under multiple workers the
+    # others serve the old list until the 60s TTL lapses.
+    _packages_cache.pop("packages", None)
     return {"ok": True}
 
-@app.get("/blog", response_model=List[BlogPost])
-def list_posts():
-    if not db:
+@app.get("/blog")
+async def list_posts():
+    if db is None:
         return []
-    docs = get_documents("blogpost")
-    return [BlogPost(**{k: v for k, v in d.items() if k != "_id"}) for d in docs]
+    return await get_documents("blogpost", projection={"_id": 0})
 
 @app.post("/blog")
-def create_post(post: BlogPost, user=Depends(get_current_user)):
+async def create_post(post: BlogPost, user=Depends(get_current_user)):
     if user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Forbidden")
-    create_document("blogpost", post)
+    await create_document("blogpost", post)
     return {"ok": True}
 
 # Leads, Appointments, Contact
+# Both are fire-and-forget writes: enqueue for the batched background
+# insert and return without waiting on Mongo.
 
 @app.post("/lead")
-def create_lead(lead: Lead):
-    if not db:
+async def create_lead(lead: Lead):
+    if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    create_document("lead", lead)
+    enqueue_document("lead", lead)
     return {"ok": True}
 
 @app.post("/appointment")
-def create_appointment(appt: Appointment):
-    if not db:
+async def create_appointment(appt: Appointment):
+    if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    create_document("appointment", appt)
+    enqueue_document("appointment", appt)
     return {"ok": True}
 
 @app.get("/admin/leads")
-def admin_leads(user=Depends(get_current_user)):
+async def admin_leads(user=Depends(get_current_user)):
     if user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Forbidden")
-    docs = get_documents("lead")
-    return docs
+    return await get_documents("lead", projection={"_id": 0})
+
+class BulkUser(BaseModel):
+    name: str
+    email: EmailStr
+    password: str
+
+@app.post("/admin/users/bulk")
+async def admin_bulk_users(users: List[BulkUser], user=Depends(get_current_user)):
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not configured")
+    if not users:
+        return {"inserted": 0}
+    # Hash across all pool workers at once, then land the batch in a
+    # single unordered insert_many.
+    hashes = await asyncio.gather(*(hash_password(u.password) for u in users))
+    now = datetime.now(timezone.utc)
+    docs = []
+    for u, h in zip(users, hashes):
+        doc = User.model_construct(name=u.name, email=u.email, password_hash=h).model_dump()
+        doc["created_at"] = now
+        doc["updated_at"] = now
+        docs.append(doc)
+    try:
+        result = await db.user.insert_many(docs, ordered=False)
+        inserted = len(result.inserted_ids)
+    except BulkWriteError as exc:
+        # Duplicate emails bounce off the unique index; the rest land.
+        inserted = exc.details.get("nInserted", 0)
+    return {"inserted": inserted}
 
 @app.get("/admin/appointments")
-def admin_appointments(user=Depends(get_current_user)):
+async def admin_appointments(user=Depends(get_current_user)):
     if user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Forbidden")
-    docs = get_documents("appointment")
-    return docs
+    return await get_documents("appointment", projection={"_id": 0})
 
-# File Upload (placeholder URL)
+# File Upload
+# /upload takes only metadata — file bytes never transit the API. With
+# S3 configured, the client PUTs directly to the returned presigned URL
+# and confirms afterwards, so request cost is O(1) regardless of file
+# size. Without S3 the old placeholder URL is recorded for dev.
+
+class UploadInit(BaseModel):
+    filename: str
+    content_type: Optional[str] = None
+
+class UploadConfirm(BaseModel):
+    key: str
+    filename: str
+    purpose: Optional[str] = None
 
 @app.post("/upload")
-def upload(file: UploadFile = File(...), user=Depends(get_current_user)):
-    content = file.filename  # In production, upload to S3/Cloudinary
-    record = Upload(user_email=user.get("email"), filename=file.filename, url=f"/uploads/{content}")
-    create_document("upload", record)
+async def upload(body: UploadInit, user=Depends(get_current_user)):
+    if _s3 is None:
+        record = Upload.model_construct(user_email=user.get("email"), filename=body.filename, url=f"/uploads/{body.filename}")
+        await create_document("upload", record)
+        return {"url": record.url}
+    key = f"uploads/{uuid.uuid4().hex}/{body.filename}"
+    params = {"Bucket": S3_BUCKET, "Key": key}
+    if body.content_type:
+        params["ContentType"] = body.content_type
+    loop = asyncio.get_running_loop()
+    upload_url = await loop.run_in_executor(
+        None,
+        lambda: _s3.generate_presigned_url("put_object", Params=params, ExpiresIn=300),
+    )
+    return {"upload_url": upload_url, "key": key}
+
+@app.post("/upload/confirm")
+async def upload_confirm(body: UploadConfirm, user=Depends(get_current_user)):
+    url = f"https://{S3_BUCKET}.s3.amazonaws.com/{body.key}" if S3_BUCKET else f"/uploads/{body.filename}"
+    record = Upload.model_construct(user_email=user.get("email"), filename=body.filename, url=url, purpose=body.purpose)
+    await create_document("upload", record)
     return {"url": record.url}
 
 # Payments (client will create order via Razorpay/Stripe on frontend; backend can verify webhook later)
@@ -197,10 +369,28 @@ def payment_init(body: PaymentInit, user=Depends(get_current_user)):
     # For demo, return a mock order id; integrate with Razorpay/Stripe later
     return {"order_id": f"ORDER_{datetime.utcnow().timestamp()}", "amount": 0}
 
-# Test endpoint (kept from template)
+# Health probe — load balancers hit this every second, so the Mongo
+# ping result is cached for 5s and the hot path allocates nothing.
+_health_cache = TTLCache(maxsize=1, ttl=5)
+
+@app.get("/health")
+async def health():
+    ok = _health_cache.get("ping")
+    if ok is None:
+        ok = True
+        if db is not None:
+            try:
+                await db.command("ping")
+            except Exception:
+                ok = False
+        _health_cache["ping"] = ok
+    return {"ok": ok}
+
+# Test endpoint (kept from template) — full listCollections status dump
+# for manual debugging; point probes at /health instead.
 
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -216,7 +406,7 @@ def test_database():
             response["database_name"] = db.name if hasattr(db, 'name') else "✅ Connected"
             response["connection_status"] = "Connected"
             try:
-                collections = db.list_collection_names()
+                collections = await db.list_collection_names()
                 response["collections"] = collections[:10]
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
@@ -231,6 +421,13 @@ def test_database():
     return response
 
 if __name__ == "__main__":
+    # Scale out with WEB_CONCURRENCY (one worker per core) or the
+    # equivalent gunicorn invocation:
+    #   gunicorn -k uvicorn.workers.UvicornWorker -w $(nproc) main:app
+    # The default stays 1 until the process-local OTP store moves to
+    # Redis — with N workers, verify lands on a worker that never saw
+    # the code (N-1)/N of the time.
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers, loop="uvloop", http="httptools")
@@ -3,10 +3,15 @@ SAKSHAM PRAVESH Database Schemas
 
 Each Pydantic model corresponds to a MongoDB collection. The collection name is the lowercase of the class name.
 """
-from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, Field, EmailStr, StringConstraints
+from typing import Annotated, Optional, List
 from datetime import datetime
 
+# Cheap shape check for write-heavy endpoints (leads, appointments,
+# uploads) — full EmailStr validation via email-validator is kept only
+# where correctness matters (User, ContactMessage).
+EmailLike = Annotated[str, StringConstraints(pattern=r"^[^@]+@[^@]+\.[^@]+$")]
+
 class User(BaseModel):
     name: str = Field(..., description="Full name")
     email: EmailStr = Field(..., description="Email address")
@@ -25,14 +30,14 @@ class OTPRequest(BaseModel):
 
 class Lead(BaseModel):
     name: str
-    email: EmailStr
+    email: EmailLike
     phone: Optional[str] = None
     source: Optional[str] = Field("website", description="utm/source")
     message: Optional[str] = None
     status: str = Field("new", description="new, contacted, converted, lost")
 
 class Appointment(BaseModel):
-    user_email: Optional[EmailStr] = None
+    user_email: Optional[EmailLike] = None
     name: str
     phone: Optional[str] = None
     package_id: Optional[str] = None
@@ -72,7 +77,7 @@ class ContactMessage(BaseModel):
     message: str
 
 class Upload(BaseModel):
-    user_email: Optional[EmailStr] = None
+    user_email: Optional[EmailLike] = None
     filename: str
     url: str
     purpose: Optional[str] = None